@@ -1,6 +1,11 @@
+import os
 import cv2
 import time
 
+# Low-latency FFmpeg demuxing (read when the capture is opened)
+os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS',
+                      'fflags;nobuffer|flags;low_delay|max_delay;0|reorder_queue_size;0')
+
 # URL of your ESP32-CAM (or any IP camera)
 stream_url = "http://172.21.11.223:81/stream"
 
@@ -11,17 +16,26 @@ if not cap.isOpened():
     print("❌ Error: Cannot open video stream at", stream_url)
     exit()
 
+# Hold at most one frame so what we show is never stale
+if not cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+    print("⚠️ Capture backend ignored CAP_PROP_BUFFERSIZE=1")
+cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+
 # FPS calculation
 fps = 0
 frame_time = time.time()
 frame_count = 0
 fps_update_interval = 10  # update every 10 frames
 
+# Frames are grabbed as fast as the stream delivers them, but only decoded
+# and shown at this interval
+display_interval = 1 / 15  # seconds
+last_display_time = 0
+
 print("✅ Connected to camera stream. Press 'q' to exit.\n")
 
 while True:
-    ret, frame = cap.read()
-    if not ret:
+    if not cap.grab():
         print("⚠️ Frame not received, check connection.")
         break
 
@@ -33,6 +47,14 @@ while True:
         fps = fps_update_interval / (current_time - frame_time)
         frame_time = current_time
 
+    if time.time() - last_display_time < display_interval:
+        continue
+
+    ret, frame = cap.retrieve()
+    if not ret:
+        continue
+    last_display_time = time.time()
+
     # Display FPS
     cv2.putText(frame, f'FPS: {fps:.2f}', (10, 30),
                 cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
@@ -45,4 +67,4 @@ while True:
         break
 
 cap.release()
-cv2.destroyAllWindows()                                                                                                                                                                                                                                  
+cv2.destroyAllWindows()
@@ -4,31 +4,63 @@ FastAPI server for GPIO control on Raspberry Pi
 Receives POST requests to control GPIO pins
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
+import re
+import threading
+import msgspec
 import uvicorn
 
-# GPIO library for Raspberry Pi
+# GPIO library for Raspberry Pi: prefer lgpio (faster writes, supported on the
+# Pi 5), fall back to RPi.GPIO
+GPIO_BACKEND = None
+# Header pins are on gpiochip0, except on a Pi 5 with an older kernel (gpiochip4)
+GPIO_CHIP = int(os.environ.get("GPIO_CHIP", "0"))
 try:
-    import RPi.GPIO as GPIO
-    GPIO_AVAILABLE = True
-    print("✅ RPi.GPIO imported successfully")
+    import lgpio
+    # Probe the chip so a missing or wrong one falls back to RPi.GPIO
+    lgpio.gpiochip_close(lgpio.gpiochip_open(GPIO_CHIP))
+    GPIO_BACKEND = "lgpio"
+    print("✅ lgpio imported successfully")
 except ImportError:
-    GPIO_AVAILABLE = False
-    print("⚠️ RPi.GPIO not available. Using simulation mode.")
+    pass
+except lgpio.error as e:
+    print(f"⚠️ lgpio cannot open gpiochip{GPIO_CHIP} ({e}), trying RPi.GPIO")
+if GPIO_BACKEND is None:
+    try:
+        import RPi.GPIO as GPIO
+        GPIO_BACKEND = "RPi.GPIO"
+        print("✅ RPi.GPIO imported successfully")
+    except ImportError:
+        print("⚠️ Neither lgpio nor RPi.GPIO available. Using simulation mode.")
+GPIO_AVAILABLE = GPIO_BACKEND is not None
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# WARNING by default: per-pin messages are DEBUG so buzzer toggles don't pay for logging
+logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize GPIO on startup and release it on shutdown"""
+    global gpio_controller
+    gpio_controller = GPIOController()
+    yield
+    gpio_controller.cleanup()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Smart Farm GPIO Controller",
     description="FastAPI server to control Raspberry Pi GPIO pins",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware to allow requests from frontend
@@ -40,20 +72,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Pydantic models for request/response
-class GPIOPinRequest(BaseModel):
+# msgspec structs for the pin endpoints: these are hit on every buzzer toggle,
+# and msgspec decodes + validates small payloads far faster than Pydantic
+class GPIOPinRequest(msgspec.Struct):
     pin: int
     state: bool  # True = HIGH/ON, False = LOW/OFF
 
-class GPIOMultiplePinsRequest(BaseModel):
+class GPIOMultiplePinsRequest(msgspec.Struct):
     pins: List[GPIOPinRequest]
 
-class GPIOResponse(BaseModel):
+class GPIOResponse(msgspec.Struct):
     pin: int
     state: bool
     status: str
     message: str
 
+# strict=False keeps accepting what Pydantic's lax mode did, e.g. "state": 1 or "true"
+pin_request_decoder = msgspec.json.Decoder(GPIOPinRequest, strict=False)
+pins_request_decoder = msgspec.json.Decoder(GPIOMultiplePinsRequest, strict=False)
+json_encoder = msgspec.json.Encoder()
+
+def json_schema(type_) -> dict:
+    """JSON schema for a msgspec type, with struct definitions inlined"""
+    (schema,), definitions = msgspec.json.schema_components([type_], ref_template="{name}")
+
+    def inline(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+
+    return inline(schema)
+
+def openapi_docs(request_type, response_type) -> dict:
+    """Route kwargs documenting a msgspec request body and 200 response in /docs"""
+    return {
+        "openapi_extra": {
+            "requestBody": {
+                "required": True,
+                "content": {"application/json": {"schema": json_schema(request_type)}}
+            }
+        },
+        "responses": {
+            200: {"content": {"application/json": {"schema": json_schema(response_type)}}}
+        }
+    }
+
+def decode_body(body: bytes, decoder: msgspec.json.Decoder):
+    """Decode and validate a JSON request body, mapping errors to HTTP 422"""
+    try:
+        return decoder.decode(body)
+    except msgspec.DecodeError as e:
+        # Same shape as FastAPI's own validation errors, e.g. for
+        # "Expected `bool`, got `str` - at `$.pins[0].state`"
+        msg, _, path = str(e).partition(" - at `$")
+        loc = ["body"] + [int(p) if p.isdigit() else p for p in re.findall(r"\w+", path)]
+        error_type = "value_error" if isinstance(e, msgspec.ValidationError) else "json_invalid"
+        raise HTTPException(status_code=422, detail=[{"type": error_type, "loc": loc, "msg": msg}])
+
+def json_response(content) -> Response:
+    """Encode a msgspec-serializable object as a JSON response"""
+    return Response(content=json_encoder.encode(content), media_type="application/json")
+
+# Pydantic models for the low-traffic endpoints
 class HealthResponse(BaseModel):
     status: str
     gpio_available: bool
@@ -62,23 +146,51 @@ class HealthResponse(BaseModel):
 # GPIO Setup and Configuration
 class GPIOController:
     def __init__(self):
-        self.initialized_pins = set()
-        if GPIO_AVAILABLE:
+        # Bit N is set once BCM pin N has been configured as an output. Pins are
+        # written from thread-pool workers, so updates to the mask take the lock.
+        self.initialized_mask = 0
+        self._setup_lock = threading.Lock()
+        if GPIO_BACKEND == "lgpio":
+            # lgpio addresses lines by BCM number on the chip handle
+            self._chip = lgpio.gpiochip_open(GPIO_CHIP)
+            self._setup_output = lambda pin: lgpio.gpio_claim_output(self._chip, pin)
+            self._write = lambda pin, level: lgpio.gpio_write(self._chip, pin, level)
+            self._read = lambda pin: lgpio.gpio_read(self._chip, pin)
+            self._HI, self._LO = 1, 0
+            logger.info("GPIO initialized on gpiochip%d via lgpio", GPIO_CHIP)
+        elif GPIO_BACKEND == "RPi.GPIO":
             GPIO.setmode(GPIO.BCM)  # Use BCM pin numbering
             GPIO.setwarnings(False)
+            self._setup_output = lambda pin: GPIO.setup(pin, GPIO.OUT)
+            self._write = GPIO.output
+            self._read = GPIO.input
+            self._HI, self._LO = GPIO.HIGH, GPIO.LOW
             logger.info("GPIO initialized with BCM mode")
     
+    def initialized_pins(self) -> List[int]:
+        """List the pins that have been set up, lowest first"""
+        pins = []
+        mask = self.initialized_mask
+        while mask:
+            low_bit = mask & -mask
+            pins.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return pins
+    
     def setup_pin(self, pin: int) -> bool:
         """Setup a GPIO pin as output"""
         try:
             if GPIO_AVAILABLE:
-                if pin not in self.initialized_pins:
-                    GPIO.setup(pin, GPIO.OUT)
-                    self.initialized_pins.add(pin)
-                    logger.info(f"Pin {pin} setup as output")
+                bit = 1 << pin
+                if not self.initialized_mask & bit:
+                    with self._setup_lock:
+                        if not self.initialized_mask & bit:
+                            self._setup_output(pin)
+                            self.initialized_mask |= bit
+                            logger.debug("Pin %d setup as output", pin)
                 return True
             else:
-                logger.info(f"SIMULATION: Pin {pin} setup as output")
+                logger.debug("SIMULATION: Pin %d setup as output", pin)
                 return True
         except Exception as e:
             logger.error(f"Error setting up pin {pin}: {e}")
@@ -92,10 +204,10 @@ class GPIOController:
                 return False
             
             if GPIO_AVAILABLE:
-                GPIO.output(pin, GPIO.HIGH if state else GPIO.LOW)
-                logger.info(f"Pin {pin} set to {'HIGH' if state else 'LOW'}")
+                self._write(pin, self._HI if state else self._LO)
+                logger.debug("Pin %d set to %s", pin, "HIGH" if state else "LOW")
             else:
-                logger.info(f"SIMULATION: Pin {pin} set to {'HIGH' if state else 'LOW'}")
+                logger.debug("SIMULATION: Pin %d set to %s", pin, "HIGH" if state else "LOW")
             return True
         except Exception as e:
             logger.error(f"Error controlling pin {pin}: {e}")
@@ -104,10 +216,10 @@ class GPIOController:
     def get_pin_state(self, pin: int) -> Optional[bool]:
         """Get the current state of a GPIO pin"""
         try:
-            if GPIO_AVAILABLE and pin in self.initialized_pins:
-                return bool(GPIO.input(pin))
+            if GPIO_AVAILABLE and self.initialized_mask >> pin & 1:
+                return bool(self._read(pin))
             else:
-                logger.info(f"SIMULATION: Reading pin {pin}")
+                logger.debug("SIMULATION: Reading pin %d", pin)
                 return None
         except Exception as e:
             logger.error(f"Error reading pin {pin}: {e}")
@@ -115,12 +227,15 @@ class GPIOController:
     
     def cleanup(self):
         """Clean up GPIO resources"""
-        if GPIO_AVAILABLE:
+        if GPIO_BACKEND == "lgpio":
+            lgpio.gpiochip_close(self._chip)  # also releases every claimed pin
+            logger.info("GPIO cleanup completed")
+        elif GPIO_BACKEND == "RPi.GPIO":
             GPIO.cleanup()
             logger.info("GPIO cleanup completed")
 
-# Initialize GPIO controller
-gpio_controller = GPIOController()
+# GPIO controller, created by the app lifespan on startup
+gpio_controller: Optional[GPIOController] = None
 
 # API Routes
 @app.get("/", response_model=HealthResponse)
@@ -141,11 +256,12 @@ async def health_check():
         message=f"Server is healthy. GPIO {'available' if GPIO_AVAILABLE else 'not available (simulation mode)'}"
     )
 
-@app.post("/gpio/pin", response_model=GPIOResponse)
-async def control_single_pin(request: GPIOPinRequest):
+@app.post("/gpio/pin", **openapi_docs(GPIOPinRequest, GPIOResponse))
+async def control_single_pin(request: Request):
     """Control a single GPIO pin"""
-    pin = request.pin
-    state = request.state
+    pin_request = decode_body(await request.body(), pin_request_decoder)
+    pin = pin_request.pin
+    state = pin_request.state
     
     # Validate pin number (BCM pins 0-27 are typically available)
     if not 0 <= pin <= 27:
@@ -154,28 +270,44 @@ async def control_single_pin(request: GPIOPinRequest):
             detail=f"Invalid pin number {pin}. Use BCM pins 0-27"
         )
     
-    # Set pin state
-    success = gpio_controller.set_pin_state(pin, state)
+    # Set pin state (GPIO calls block, so keep them off the event loop)
+    success = await run_in_threadpool(gpio_controller.set_pin_state, pin, state)
     
     if success:
-        return GPIOResponse(
+        return json_response(GPIOResponse(
             pin=pin,
             state=state,
             status="success",
             message=f"Pin {pin} set to {'HIGH' if state else 'LOW'}"
-        )
+        ))
     else:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to control pin {pin}"
         )
 
-@app.post("/gpio/pins", response_model=List[GPIOResponse])
-async def control_multiple_pins(request: GPIOMultiplePinsRequest):
+@app.post("/gpio/pins", **openapi_docs(GPIOMultiplePinsRequest, List[GPIOResponse]))
+async def control_multiple_pins(request: Request):
     """Control multiple GPIO pins"""
+    pins_request = decode_body(await request.body(), pins_request_decoder)
     responses = []
+
+    # Writes to different pins are independent, so each pin gets its own worker
+    # thread; repeated writes to the same pin stay in request order
+    writes_by_pin = {}
+    for index, pin_request in enumerate(pins_request.pins):
+        if 0 <= pin_request.pin <= 27:
+            writes_by_pin.setdefault(pin_request.pin, []).append((index, pin_request.state))
+
+    def apply_writes(pin, writes):
+        return [(index, gpio_controller.set_pin_state(pin, state)) for index, state in writes]
+
+    outcomes = await asyncio.gather(*(
+        run_in_threadpool(apply_writes, pin, writes) for pin, writes in writes_by_pin.items()
+    ))
+    success_by_index = dict(result for pin_results in outcomes for result in pin_results)
     
-    for pin_request in request.pins:
+    for index, pin_request in enumerate(pins_request.pins):
         pin = pin_request.pin
         state = pin_request.state
         
@@ -189,8 +321,7 @@ async def control_multiple_pins(request: GPIOMultiplePinsRequest):
             ))
             continue
         
-        # Set pin state
-        success = gpio_controller.set_pin_state(pin, state)
+        success = success_by_index[index]
         
         if success:
             responses.append(GPIOResponse(
@@ -207,7 +338,7 @@ async def control_multiple_pins(request: GPIOMultiplePinsRequest):
                 message=f"Failed to control pin {pin}"
             ))
     
-    return responses
+    return json_response(responses)
 
 @app.get("/gpio/pin/{pin}")
 async def get_pin_state(pin: int):
@@ -219,7 +350,7 @@ async def get_pin_state(pin: int):
             detail=f"Invalid pin number {pin}. Use BCM pins 0-27"
         )
     
-    state = gpio_controller.get_pin_state(pin)
+    state = await run_in_threadpool(gpio_controller.get_pin_state, pin)
     
     return {
         "pin": pin,
@@ -233,8 +364,8 @@ async def reset_all_pins():
     try:
         # Reset all initialized pins to LOW
         responses = []
-        for pin in list(gpio_controller.initialized_pins):
-            success = gpio_controller.set_pin_state(pin, False)
+        for pin in gpio_controller.initialized_pins():
+            success = await run_in_threadpool(gpio_controller.set_pin_state, pin, False)
             responses.append({
                 "pin": pin,
                 "state": False,
@@ -252,13 +383,6 @@ async def reset_all_pins():
             detail=f"Error resetting pins: {e}"
         )
 
-# Initialize GPIO controller
-gpio_controller = GPIOController()
-
-# Cleanup handler for when the main process ends
-import atexit
-atexit.register(lambda: gpio_controller.cleanup())
-
 if __name__ == "__main__":
     try:
         print("\n🚀 Starting Smart Farm GPIO Controller Server")
@@ -276,12 +400,15 @@ if __name__ == "__main__":
             "gpio_control_server:app",
             host="0.0.0.0",  # Allow external connections
             port=8000,
-            reload=True,
-            log_level="info"
+            reload=False,
+            # The pins are one physical resource and the controller tracks their
+            # state in memory, so a single process must own them
+            workers=1,
+            loop="uvloop",
+            http="httptools",
+            log_level="warning"
         )
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except Exception as e:
-        print(f"❌ Error starting server: {e}")
-    finally:
-        gpio_controller.cleanup()
\ No newline at end of file
+        print(f"❌ Error starting server: {e}")
\ No newline at end of file
@@ -5,16 +5,21 @@ Demonstrates how to send POST requests to control GPIO pins
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 
 # Server configuration
 SERVER_URL = "http://localhost:8000"
 
+# One keep-alive session for all calls instead of a new connection per request
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 def test_server_health():
     """Test if the server is running"""
     try:
-        response = requests.get(f"{SERVER_URL}/health")
+        response = SESSION.get(f"{SERVER_URL}/health")
         if response.status_code == 200:
             data = response.json()
             print(f"✅ Server is {data['status']}")
@@ -34,7 +39,7 @@ def control_single_pin(pin, state):
             "pin": pin,
             "state": state
         }
-        response = requests.post(f"{SERVER_URL}/gpio/pin", json=data)
+        response = SESSION.post(f"{SERVER_URL}/gpio/pin", json=data)
         
         if response.status_code == 200:
             result = response.json()
@@ -53,7 +58,7 @@ def control_multiple_pins(pin_states):
         data = {
             "pins": [{"pin": pin, "state": state} for pin, state in pin_states]
         }
-        response = requests.post(f"{SERVER_URL}/gpio/pins", json=data)
+        response = SESSION.post(f"{SERVER_URL}/gpio/pins", json=data)
         
         if response.status_code == 200:
             results = response.json()
@@ -71,7 +76,7 @@ def control_multiple_pins(pin_states):
 def get_pin_state(pin):
     """Get the current state of a GPIO pin"""
     try:
-        response = requests.get(f"{SERVER_URL}/gpio/pin/{pin}")
+        response = SESSION.get(f"{SERVER_URL}/gpio/pin/{pin}")
         
         if response.status_code == 200:
             result = response.json()
@@ -87,7 +92,7 @@ def get_pin_state(pin):
 def reset_all_pins():
     """Reset all GPIO pins to LOW"""
     try:
-        response = requests.post(f"{SERVER_URL}/gpio/reset")
+        response = SESSION.post(f"{SERVER_URL}/gpio/reset")
         
         if response.status_code == 200:
             result = response.json()
@@ -1,14 +1,142 @@
 import cv2
 import numpy as np
+import torch
 from ultralytics import YOLO
 import time
 from datetime import datetime, timezone
-import requests
+import httpx
+import asyncio
+import concurrent.futures
 import socket
+import struct
 import threading
 import os
-import random
+
+# orjson serializes request bodies straight to bytes; fall back to stdlib json
+try:
+    from orjson import dumps as json_dumps
+except ImportError:
+    import json
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+# uvloop gives the network thread a faster event loop where it is installed
+try:
+    import uvloop
+    new_event_loop = uvloop.new_event_loop
+except ImportError:
+    new_event_loop = asyncio.new_event_loop
+
 os.environ['DISPLAY'] = ':0'
+# FFmpeg fallback: no demuxer buffering
+os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS',
+                      'fflags;nobuffer|flags;low_delay|max_delay;0|reorder_queue_size;0')
+# Reuse torch.compile's Inductor kernels across runs instead of recompiling at every start
+os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', os.path.abspath('.torchinductor_cache'))
+
+# Where Ultralytics writes exports of <stem>.pt (older releases omit the "int8_"
+# prefix), so the export only has to run once. Delete an export to rebuild it.
+# Exports are renamed to carry their input size, since they are built for one imgsz
+EXPORT_PATHS = {
+    'openvino': ['{stem}_{imgsz}_int8_openvino_model', '{stem}_{imgsz}_openvino_model'],
+    'tflite': ['{stem}_saved_model/{stem}_{imgsz}_int8.tflite'],
+    'engine': ['{stem}_{imgsz}.engine'],
+}
+
+# Low-precision export settings per format. TensorRT engines are FP16 with a static
+# imgsz x imgsz input so TensorRT never has to re-plan for a new shape.
+EXPORT_OPTIONS = {
+    'openvino': {'int8': True},
+    'tflite': {'int8': True},
+    'engine': {'half': True, 'dynamic': False, 'device': 0},
+}
+
+# Wire format of one distance reading from ultrasonic.py: a little-endian float32 (cm).
+# Each connection opens with DISTANCE_MAGIC so an older (ASCII) or newer sender is
+# rejected instead of being read as garbage distances; bump its version byte and
+# upgrade both scripts together when the format changes.
+DISTANCE_MAGIC = b'SFD\x01'
+DISTANCE_FRAME = struct.Struct('<f')
+
+# GStreamer H.264 decode stages: hardware V4L2 M2M on the Pi, NVDEC on Jetson
+H264_DECODERS = {
+    'pi': 'v4l2h264dec',
+    'jetson': 'nvv4l2decoder ! nvvidconv',
+    'software': 'avdec_h264',
+}
+
+# Samples a blocked GStreamer appsink pipeline holds back: the one queued in the
+# appsink and the one its streaming thread is waiting to push
+GST_STALE_SAMPLES = 2
+
+# small randomness: usually keep base, sometimes nudge up/down, rarely jump two levels.
+# A roll below 0.05 moves up two levels, below 0.20 up one, below 0.25 down one.
+SEVERITY_ROLL_EDGES = np.array([0.05, 0.20, 0.25])
+SEVERITY_OFFSETS = np.array([2, 1, -1, 0])
+
+def compute_alerts(class_ids, model_confs, jitter, rolls, base_idx_arr, low_arr, high_arr, num_levels):
+    """Return (severity_idx, offsets, confidences) arrays for all detections in a frame"""
+    # Map model's 0..1 confidence into a type-specific range, add small jitter, and clamp.
+    low = low_arr[class_ids]
+    high = high_arr[class_ids]
+    confs = np.clip(low + (high - low) * model_confs + jitter, 0.0, 1.0)
+
+    offsets = SEVERITY_OFFSETS[np.searchsorted(SEVERITY_ROLL_EDGES, rolls, side='right')]
+    severity_idx = np.clip(base_idx_arr[class_ids] + offsets, 0, num_levels - 1)
+    return severity_idx, offsets, confs
+
+class CameraGrabber:
+    """Drain the camera stream on a background thread, keeping only the newest frame"""
+    def __init__(self, cap, on_demand=False):
+        self.cap = cap
+        # On-demand capture pulls from a blocking GStreamer appsink only when a
+        # frame is wanted, so the pipeline drops stale frames before decoding them
+        self.on_demand = on_demand
+        self.lock = threading.Lock()
+        self.frame = None
+        self._wanted = threading.Event()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Grab continuously; decode only when the consumer asked for a frame"""
+        # This thread releases the capture itself, so it is never freed while
+        # a grab() on a stalled stream is still running
+        try:
+            while not self._stopped.is_set():
+                if self.on_demand:
+                    if not self._wanted.wait(0.1):
+                        continue
+                    for _ in range(GST_STALE_SAMPLES):
+                        self.cap.grab()
+                if not self.cap.grab():
+                    time.sleep(0.01)
+                    continue
+                if self._wanted.is_set():
+                    ret, frame = self.cap.retrieve()
+                    if not ret:
+                        continue
+                    with self.lock:
+                        self.frame = frame
+                    self._wanted.clear()
+                    self._ready.set()
+        finally:
+            self.cap.release()
+
+    def get_latest(self, timeout=1.0):
+        """Return the next freshly decoded frame, or None on timeout"""
+        self._ready.clear()
+        self._wanted.set()
+        if not self._ready.wait(timeout):
+            return None
+        with self.lock:
+            frame, self.frame = self.frame, None
+        return frame
+
+    def stop(self):
+        """Ask the thread to exit; it releases the capture once any grab() returns"""
+        self._stopped.set()
 
 class SmartAnimalDetector:
     def __init__(self, 
@@ -16,82 +144,465 @@ class SmartAnimalDetector:
                  stream_url='http://10.23.204.199:81/stream',
                  buzzer_url='http://10.23.204.218:8000/gpio/pins',
                  buzzer_pin=17,
-                 distance_port=5000):
+                 distance_port=5000,
+                 log_url='https://smart-farm-intrusion-detection-server.onrender.com/api/log/create/6909cdfab50cff3e260f9fef',
+                 use_gstreamer=True,
+                 stream_codec='mjpeg',
+                 h264_decoder='pi',
+                 quantize=True,
+                 export_format=None,
+                 int8_calibration_data=None,
+                 use_torch_compile=True,
+                 imgsz=640):
         
-        # YOLO model and stream setup
-        self.model = YOLO(model_path)
+        # YOLO model and stream setup. Without an explicit export format, use a
+        # TensorRT engine on CUDA hosts and INT8 OpenVINO on CPU-only ones.
+        # imgsz=640 is Ultralytics' default; 320 runs on a quarter of the pixels
+        # but misses more small or distant animals.
+        if export_format is None:
+            export_format = 'engine' if torch.cuda.is_available() else 'openvino'
+        self.imgsz = imgsz
+        self.model = self.load_model(model_path, export_format, quantize, int8_calibration_data)
         self.stream_url = stream_url
         self.cap = None
 
+        self.frame_size = (imgsz, imgsz * 3 // 4)  # (width, height) of the 4:3 frames fed to YOLO
+
+        self.use_gstreamer = use_gstreamer
+        self.gst_pipeline = self.build_gst_pipeline(stream_codec, h264_decoder)
+
         # Buzzer control parameters
         self.buzzer_pin = buzzer_pin
         self.buzzer_url = buzzer_url
-        self.buzzer_on = False
         self.buzzer_duration = 1.0  # seconds
-        self.last_buzzer_time = 0
+        self._buzzer_off_deadline = 0.0  # monotonic time to switch off at; 0.0 while off
+        self._buzzer_state = False  # latest state asked for; only this one is ever sent
+        self.buzzer_retry_delay = 1.0  # seconds before resending after a failed request
+
+        self.log_url = log_url
 
         # Distance socket setup
         self.distance_port = distance_port
         self.current_distance = 999  # initialize with a large distance
+        self._distance_updated = threading.Event()  # wakes the detection loop early
         self.distance_threshold = 50  # cm
 
+        # Network setup: the distance server and all buzzer/log HTTP requests share
+        # one asyncio loop on a background thread, so the main thread only runs
+        # OpenCV and YOLO. At most 32 log uploads may be in flight; beyond that
+        # new ones are dropped rather than piling up.
+        self.loop = new_event_loop()
+        self.http_client = None  # created on the loop by start_network
+        self._distance_server = None
+        self._log_slots = threading.BoundedSemaphore(32)
+        threading.Thread(target=self.run_network_loop, daemon=True).start()
+        self.run_on_network_loop(self.start_network())
+
+        # Detection cadence: 2 Hz while something is within the threshold, doubling
+        # up to max_detection_interval while YOLO keeps finding no animal there.
+        # A distance change of distance_change_reset or more counts as something
+        # new arriving and drops back to the fast interval.
+        self.detection_interval = 0.5  # seconds
+        self.max_detection_interval = 4.0
+        self.distance_change_reset = 10  # cm
+
         # Detection settings
-        self.animal_classes = [
+        self.animal_classes = frozenset(name.lower() for name in [
             'bird', 'cat', 'dog', 'horse', 'sheep', 'cow', 
             'elephant', 'bear', 'zebra', 'giraffe', 'rat'
-        ]
+        ])
+        # Model class ids of the animals above, for filtering detections without string work
+        self._animal_ids = np.array(
+            [i for i, n in self.model.names.items() if n.lower() in self.animal_classes],
+            dtype=np.int32
+        )
 
-    # ---------------------- BUZZER CONTROL ----------------------
-    def control_buzzer(self, state: bool):
-        """Control the buzzer via REST API"""
+        # base severity by animal type
+        self._severity_order = ['low', 'medium', 'high', 'critical']
+        self._base_map = {
+            'bird': 'low',
+            'rat': 'low',
+            'cat': 'medium',
+            'dog': 'medium',
+            'sheep': 'medium',
+            'horse': 'high',
+            'cow': 'high',
+            'bear': 'high',
+            'zebra': 'high',
+            'giraffe': 'high',
+            'elephant': 'critical'
+        }
+
+        # Confidence ranges per animal type: dangerous/large animals -> higher reported confidence,
+        # small/ambiguous animals -> lower reported confidence.
+        self._conf_ranges = {
+            'elephant': (0.8, 1.0),
+            'bear': (0.8, 1.0),
+            'horse': (0.7, 0.95),
+            'cow': (0.7, 0.95),
+            'zebra': (0.7, 0.95),
+            'giraffe': (0.7, 0.95),
+            'dog': (0.6, 0.9),
+            'cat': (0.6, 0.9),
+            'sheep': (0.6, 0.9),
+            'bird': (0.4, 0.75),
+            'rat': (0.4, 0.7)
+        }
+
+        # The same tables flattened into arrays indexed by model class id for compute_alerts()
+        num_classes = len(self.model.names)
+        self._base_idx_arr = np.full(num_classes, self._severity_order.index('medium'), dtype=np.int64)
+        self._low_arr = np.full(num_classes, 0.5)
+        self._high_arr = np.full(num_classes, 0.9)
+        for class_id, name in self.model.names.items():
+            animal = name.lower()
+            if animal in self._base_map:
+                self._base_idx_arr[class_id] = self._severity_order.index(self._base_map[animal])
+            if animal in self._conf_ranges:
+                self._low_arr[class_id], self._high_arr[class_id] = self._conf_ranges[animal]
+        self._rng = np.random.default_rng()
+
+        # Persistent model input: the 1x3ximgszximgsz RGB 0..1 letterboxed tensor Ultralytics
+        # would otherwise allocate and convert into on every call. Frames are written
+        # into its middle rows in place; the pad rows keep the letterbox grey.
+        width, height = self.frame_size
+        self._input = torch.full((1, 3, width, width), 114 / 255.0)
+        if torch.cuda.is_available():
+            self._input = self._input.pin_memory()
+        self._input_np = self._input.numpy()
+        self._input_rows = slice((width - height) // 2, (width - height) // 2 + height)
+        self._rgb = np.empty((height, width, 3), dtype=np.uint8)
+        self._small = np.empty((height, width, 3), dtype=np.uint8)  # FFmpeg-path resize target
+
+        self.prepare_model(use_torch_compile)
+
+    # ---------------------- MODEL LOADING ----------------------
+    def load_model(self, model_path, export_format, quantize, int8_calibration_data=None):
+        """Load YOLO, using (and building on first run) a low-precision export when quantize is set"""
+        if not quantize or not model_path.endswith('.pt'):
+            return YOLO(model_path)
+
+        stem = os.path.splitext(model_path)[0]
+        for template in EXPORT_PATHS.get(export_format, []):
+            exported = template.format(stem=stem, imgsz=self.imgsz)
+            if os.path.exists(exported):
+                print(f"[INFO] Using {export_format} model: {exported}")
+                return YOLO(exported, task='detect')
+
+        options = dict(EXPORT_OPTIONS.get(export_format, {'int8': True}))
+        if export_format == 'engine' and int8_calibration_data:
+            # INT8 TensorRT needs a dataset (e.g. 'coco.yaml') to calibrate against
+            options.update(half=False, int8=True, data=int8_calibration_data)
+
+        try:
+            print(f"[INFO] Exporting {model_path} to {export_format} {options}...")
+            exported = YOLO(model_path).export(format=export_format, imgsz=self.imgsz, **options)
+        except Exception as e:
+            print(f"[WARN] {export_format} export failed ({e}), using FP32 weights")
+            return YOLO(model_path)
+        # e.g. yolov8n_int8_openvino_model -> yolov8n_640_int8_openvino_model
+        name = os.path.basename(stem)
+        head, tail = os.path.split(str(exported))
+        sized = os.path.join(head, tail.replace(name, f'{name}_{self.imgsz}', 1))
+        os.replace(exported, sized)
+        return YOLO(sized, task='detect')
+
+    def prepare_model(self, use_torch_compile):
+        """Build the predictor and, for plain PyTorch weights, tune it for the device"""
+        # Exported models run in their own runtime and already carry their precision
+        pytorch = isinstance(self.model.model, torch.nn.Module)
+        self._half = pytorch and torch.cuda.is_available()
+
+        with torch.inference_mode():
+            # The first call builds Ultralytics' predictor (which fuses conv+bn into
+            # new layers), so the layout change and compile apply to the module it runs
+            self.model(self._input, half=self._half, verbose=False)
+            if not pytorch:
+                return
+            backend = self.model.predictor.model
+
+            if self._half:
+                # FP16 weights in channels_last let cuDNN pick Tensor Core conv kernels
+                backend.model.to(memory_format=torch.channels_last)
+
+            if use_torch_compile and hasattr(torch, 'compile'):
+                # Call again so compilation happens here, not mid-stream
+                eager = backend.model
+                backend.model = torch.compile(eager, mode="reduce-overhead", fullgraph=True)
+                try:
+                    self.model(self._input, half=self._half, verbose=False)
+                    print("[INFO] YOLO forward pass compiled with torch.compile")
+                except Exception as e:
+                    print(f"[WARN] torch.compile failed ({e}), running eager")
+                    backend.model = eager
+
+    # ---------------------- NETWORK LOOP ----------------------
+    def run_network_loop(self):
+        """Run the asyncio loop that owns every socket and HTTP connection"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def start_network(self):
+        """Create the HTTP client and start the distance server on the loop"""
+        self.http_client = httpx.AsyncClient(
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(max_keepalive_connections=4, max_connections=8)
+        )
+        # Requests run concurrently on the loop; this FIFO lock keeps buzzer
+        # commands in order so a late ON can never overtake the OFF after it
+        self._buzzer_lock = asyncio.Lock()
+        self._buzzer_changed = asyncio.Event()
+        self._buzzer_task = asyncio.create_task(self.buzzer_sender())
+        self._distance_server = await asyncio.start_server(
+            self.handle_distance_sender, "0.0.0.0", self.distance_port
+        )
+        print(f"[INFO] Listening for distance data on port {self.distance_port}...")
+
+    async def stop_network(self):
+        """Stop the buzzer sender and close the distance server and HTTP client"""
+        self._buzzer_task.cancel()
+        # Not wait_closed(): it would also wait for the connected sender to hang up
+        self._distance_server.close()
+        await self.http_client.aclose()
+
+    def submit_log(self, payload) -> bool:
+        """Schedule a log upload on the network loop, dropping it if too many are pending"""
+        if not self._log_slots.acquire(blocking=False):
+            print("[WARN] Too many pending log uploads, dropping one")
+            return False
+        future = asyncio.run_coroutine_threadsafe(self.send_log(payload), self.loop)
+        future.add_done_callback(self.log_done)
+        return True
+
+    def log_done(self, future):
+        """Free the upload's slot and report anything send_log didn't catch"""
+        self._log_slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[ERROR] Log upload: {future.exception()}")
+
+    def run_on_network_loop(self, coro, timeout=5):
+        """Run a coroutine on the network loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def send_log(self, payload):
+        """Post a detection log to the dashboard server"""
         try:
-            response = requests.post(
-                self.buzzer_url,
-                headers={"Content-Type": "application/json"},
-                json={"pins": [{"pin": self.buzzer_pin, "state": state}]},
-                timeout=2
+            response = await self.http_client.post(
+                self.log_url,
+                content=json_dumps(payload),
+                timeout=5  # off the detection loop, so a slow server only delays the log
             )
-            if response.status_code == 200:
-                self.buzzer_on = state
-                print(f"Buzzer {'ON' if state else 'OFF'}")
-            else:
+        except httpx.HTTPError as e:
+            print(f"Error sending log: {e}")
+            response = None
+
+        print(f"Log sent. Server response: {getattr(response, 'status_code', 'N/A')}")
+
+    # ---------------------- BUZZER CONTROL ----------------------
+    def request_buzzer(self, state: bool):
+        """Ask for a buzzer state change without waiting for it"""
+        self._buzzer_state = state
+        self.loop.call_soon_threadsafe(self._buzzer_changed.set)
+
+    async def buzzer_sender(self):
+        """Send the latest requested buzzer state, retrying until it lands"""
+        # States requested while a send is in flight collapse into the newest one,
+        # so an unreachable buzzer server never builds up a backlog to replay
+        while True:
+            await self._buzzer_changed.wait()
+            self._buzzer_changed.clear()
+            # If this task died, buzzer requests would go unanswered, so survive anything
+            try:
+                sent = await self.control_buzzer(self._buzzer_state)
+            except Exception as e:
+                print(f"[ERROR] Buzzer sender: {e}")
+                sent = False
+            if not sent:
+                await asyncio.sleep(self.buzzer_retry_delay)
+                self._buzzer_changed.set()
+
+    def switch_buzzer_off(self):
+        """Turn the buzzer off and wait for the request to finish"""
+        self._buzzer_state = False
+        try:
+            self.run_on_network_loop(self.control_buzzer(False))
+        except concurrent.futures.TimeoutError:
+            # buzzer_sender keeps retrying the OFF for as long as the process runs
+            print("[WARN] Buzzer OFF still pending")
+
+    async def control_buzzer(self, state: bool) -> bool:
+        """Control the buzzer via REST API"""
+        async with self._buzzer_lock:
+            try:
+                response = await self.http_client.post(
+                    self.buzzer_url,
+                    content=json_dumps({"pins": [{"pin": self.buzzer_pin, "state": state}]}),
+                    timeout=2
+                )
+                if response.status_code == 200:
+                    print(f"Buzzer {'ON' if state else 'OFF'}")
+                    return True
                 print(f"Failed to control buzzer. Status code: {response.status_code}")
-        except Exception as e:
-            print(f"Error controlling buzzer: {e}")
+            except httpx.HTTPError as e:
+                print(f"Error controlling buzzer: {e}")
+            return False
 
     # ---------------------- DISTANCE RECEIVER ----------------------
-    def distance_listener(self):
-        """Listen for incoming distance data over TCP"""
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.bind(("0.0.0.0", self.distance_port))
-        server.listen(1)
-        print(f"[INFO] Listening for distance data on port {self.distance_port}...")
-        
-        conn, addr = server.accept()
+    async def handle_distance_sender(self, reader, writer):
+        """Read distance data from a connected ultrasonic sender"""
+        addr = writer.get_extra_info('peername')
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         print(f"[INFO] Connected to distance sender: {addr}")
 
+        # StreamReader buffers the byte stream, so readings split across or packed
+        # into segments still come out as whole frames. current_distance is only
+        # ever replaced by a single float assignment, which is atomic under the
+        # GIL, so the detection thread needs no lock.
         try:
+            magic = await reader.readexactly(len(DISTANCE_MAGIC))
+            if magic != DISTANCE_MAGIC:
+                print(f"[ERROR] Distance sender {addr} sent {magic!r}, expected {DISTANCE_MAGIC!r}; "
+                      "update ultrasonic.py to match this tl3.py")
+                return
             while True:
-                data = conn.recv(1024)
-                if not data:
-                    break
-                dist_str = data.decode().strip()
-                try:
-                    self.current_distance = float(dist_str)
-                except ValueError:
-                    continue
+                frame = await reader.readexactly(DISTANCE_FRAME.size)
+                (self.current_distance,) = DISTANCE_FRAME.unpack(frame)
                 print(f"Received Distance: {self.current_distance:.2f} cm")
+                self._distance_updated.set()
+        except asyncio.IncompleteReadError:
+            pass
         except Exception as e:
             print(f"[ERROR] Distance listener: {e}")
         finally:
-            conn.close()
-            server.close()
-            print("[INFO] Distance listener stopped.")
+            writer.close()
+            print(f"[INFO] Distance sender disconnected: {addr}")
+
+    # ---------------------- VIDEO CAPTURE ----------------------
+    def build_gst_pipeline(self, stream_codec, h264_decoder):
+        """Build the GStreamer capture pipeline for an MJPEG or H.264 HTTP stream"""
+        # The appsink blocks once it holds a frame, so between pulls the leaky
+        # queue drops stale frames inside the pipeline instead of them piling up
+        # in FFmpeg's demux buffer, and videoscale downsizes in C before the
+        # frame ever reaches Python
+        leaky_queue = "queue leaky=downstream max-size-buffers=1"
+        if stream_codec == 'h264':
+            # Expects a raw Annex-B H.264 stream over HTTP, with no MP4/TS container.
+            # It is decoded on the SoC's video block rather than the CPU, and since
+            # frames reference earlier ones only decoded frames may be dropped
+            decode = f"h264parse ! {H264_DECODERS[h264_decoder]} ! {leaky_queue}"
+        else:
+            # Each JPEG stands alone, so stale ones are dropped before decoding and
+            # only pulled frames are decoded
+            decode = f"multipartdemux ! {leaky_queue} ! jpegdec"
+
+        width, height = self.frame_size
+        return (
+            f"souphttpsrc location={self.stream_url} is-live=true do-timestamp=true "
+            f"! {decode} ! videoscale "
+            f"! video/x-raw,width={width},height={height} "
+            "! videoconvert "
+            "! appsink drop=false max-buffers=1 sync=false"
+        )
+
+    def open_capture(self):
+        """Open the camera stream with a single-frame buffer"""
+        if self.use_gstreamer:
+            cap = cv2.VideoCapture(self.gst_pipeline, cv2.CAP_GSTREAMER)
+            if cap.isOpened():
+                print("[INFO] Using GStreamer capture pipeline")
+                return cap
+            print("[WARN] GStreamer pipeline unavailable, falling back to FFmpeg")
+
+        cap = cv2.VideoCapture(self.stream_url)
+        if not cap.isOpened():
+            return cap
+
+        if not cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+            print("[WARN] Capture backend ignored CAP_PROP_BUFFERSIZE=1")
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        return cap
 
     # ---------------------- ANIMAL DETECTION ----------------------
+    def process_frame(self, frame, current_time):
+        """Run YOLO on one frame, log any animals and trigger the buzzer; return whether any were seen"""
+        # The GStreamer pipeline already delivers frame_size; only the
+        # FFmpeg fallback still needs resizing here
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        np.multiply(self._rgb.transpose(2, 0, 1), 1 / 255.0,
+                    out=self._input_np[0, :, self._input_rows, :])
+        with torch.inference_mode():
+            results = self.model(self._input, conf=0.5, half=self._half, verbose=False)
+
+        animal_detected = False
+        for result in results:
+            # One device->host transfer per frame, then keep only animal boxes
+            class_ids = result.boxes.cls.cpu().numpy().astype(np.int32)
+            confs = result.boxes.conf.cpu().numpy()
+            mask = np.isin(class_ids, self._animal_ids)
+            class_ids, confs = class_ids[mask], confs[mask]
+            if not class_ids.size:
+                continue
+
+            # Every detection in the frame shares one timestamp, read from the clock once
+            now = datetime.now(timezone.utc)
+            timestamp = now.astimezone().strftime("%H:%M:%S")
+            timestamp_iso = now.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+            # Adjust the model confidence and severity based on animal type
+            severity_idxs, offsets, adjusted_confs = compute_alerts(
+                class_ids, confs,
+                self._rng.uniform(-0.02, 0.02, class_ids.size),
+                self._rng.random(class_ids.size),
+                self._base_idx_arr, self._low_arr, self._high_arr,
+                len(self._severity_order)
+            )
+
+            for class_id, conf, severity_idx, offset, adjusted_conf in zip(
+                    class_ids.tolist(), confs, severity_idxs.tolist(),
+                    offsets.tolist(), adjusted_confs.tolist()):
+                class_name = self.model.names[class_id]
+                print(f"[{timestamp}] 🐾 {class_name} (conf: {conf:.2f}) detected.")
+                print(f"Sending timestamp: {timestamp_iso}")
+                base = self._severity_order[self._base_idx_arr[class_id]]
+                severity = self._severity_order[severity_idx]
+
+                # use detected confidence (0..1) -> percentage
+                confidence_val = round(adjusted_conf * 100, 1)
+
+                payload = {
+                    "location": {
+                        "latitude": 40.7128,
+                        "longitude": -74.006,
+                        "zone": "North Pasture"
+                    },
+                    "detectionType": "camera",
+                    "timestamp": timestamp_iso,
+                    "severity": severity,
+                    "animalType": class_name,
+                    "confidence": confidence_val,
+                    "resolved": False
+                }
+
+                self.submit_log(payload)
+
+                print(f"Chosen severity: {severity} (base: {base}, offset: {offset})")
+                animal_detected = True
+
+        # Activate buzzer only if animal detected & distance < 50 cm
+        if animal_detected and self.current_distance < self.distance_threshold:
+            print(f"⚠️  Animal nearby ({self.current_distance:.2f} cm) - Activating buzzer!")
+            # Already sounding: just push the switch-off time back
+            if not self._buzzer_off_deadline:
+                self.request_buzzer(True)
+            self._buzzer_off_deadline = current_time + self.buzzer_duration
+
+        return animal_detected
+
     def start_detection(self):
         """Run YOLO detection + buzzer logic"""
-        self.cap = cv2.VideoCapture(self.stream_url)
+        self.cap = self.open_capture()
         if not self.cap.isOpened():
             print("Failed to connect to IP camera")
             return
@@ -101,158 +612,71 @@ class SmartAnimalDetector:
         print("-------------------------------------------------------------")
 
         # Ensure buzzer is off initially
-        self.control_buzzer(False)
+        self.switch_buzzer_off()
+
+        # Capture runs on its own thread so YOLO never waits on the network
+        grabber = CameraGrabber(self.cap, on_demand=self.cap.getBackendName() == 'GSTREAMER')
+        grabber_thread = threading.Thread(target=grabber.run, daemon=True)
+        grabber_thread.start()
 
-        frame_count = 0
-        last_detection_time = time.time()
+        # Intervals use the monotonic clock so NTP adjustments can't stall or rush them
+        last_detection_time = time.monotonic()
+        detection_interval = self.detection_interval
+        last_detection_distance = self.current_distance
 
         try:
             while True:
-                
-                ret, frame = self.cap.read()
-                if not ret:
-                    continue
-
-                frame_count += 1
-                current_time = time.time()
+                current_time = time.monotonic()
 
                 # Turn off buzzer after duration
-                if self.buzzer_on and (current_time - self.last_buzzer_time >= self.buzzer_duration):
-                    self.control_buzzer(False)
+                if self._buzzer_off_deadline and current_time >= self._buzzer_off_deadline:
+                    self.request_buzzer(False)
+                    self._buzzer_off_deadline = 0.0
                     
-                results = []
-
-                # Process every 0.5 seconds
-                if current_time - last_detection_time >= 0.5:
-                    small_frame = cv2.resize(frame, (320, 240))
-                    if(self.current_distance < self.distance_threshold):
-                        results = self.model(small_frame, conf=0.5, verbose=False)
-
-                    animal_detected = False
-                    for result in results:
-                        for box in result.boxes:
-                            class_id = int(box.cls[0].cpu().numpy())
-                            class_name = self.model.names[class_id]
-                            if class_name.lower() in self.animal_classes:
-                                conf = box.conf[0].cpu().numpy()
-                                timestamp = datetime.now().strftime("%H:%M:%S")
-                                print(f"[{timestamp}] 🐾 {class_name} (conf: {conf:.2f}) detected.")
-                                timestamp_iso = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
-                                print(f"Sending timestamp: {timestamp_iso}")
-                                # base severity by animal type
-                                severity_order = ['low', 'medium', 'high', 'critical']
-                                base_map = {
-                                    'bird': 'low',
-                                    'rat': 'low',
-                                    'cat': 'medium',
-                                    'dog': 'medium',
-                                    'sheep': 'medium',
-                                    'horse': 'high',
-                                    'cow': 'high',
-                                    'bear': 'high',
-                                    'zebra': 'high',
-                                    'giraffe': 'high',
-                                    'elephant': 'critical'
-                                }
-
-                                # Confidence ranges per animal type: dangerous/large animals -> higher reported confidence,
-                                # small/ambiguous animals -> lower reported confidence.
-                                conf_ranges = {
-                                    'elephant': (0.8, 1.0),
-                                    'bear': (0.8, 1.0),
-                                    'horse': (0.7, 0.95),
-                                    'cow': (0.7, 0.95),
-                                    'zebra': (0.7, 0.95),
-                                    'giraffe': (0.7, 0.95),
-                                    'dog': (0.6, 0.9),
-                                    'cat': (0.6, 0.9),
-                                    'sheep': (0.6, 0.9),
-                                    'bird': (0.4, 0.75),
-                                    'rat': (0.4, 0.7)
-                                }
-
-                                # Adjust the model confidence based on animal type.
-                                # Map model's 0..1 confidence into a type-specific range, add small jitter, and clamp.
-                                try:
-                                    model_conf = float(conf)
-                                except Exception:
-                                    model_conf = 0.5
-                                low, high = conf_ranges.get(class_name.lower(), (0.5, 0.9))
-                                conf = low + (high - low) * model_conf + random.uniform(-0.02, 0.02)
-                                conf = max(0.0, min(1.0, conf))
-
-                                base = base_map.get(class_name.lower(), 'medium')
-                                base_idx = severity_order.index(base)
-
-                                # small randomness: usually keep base, sometimes nudge up/down, rarely jump two levels
-                                r = random.random()
-                                if r < 0.05:
-                                    offset = 2
-                                elif r < 0.20:
-                                    offset = 1
-                                elif r < 0.25:
-                                    offset = -1
-                                else:
-                                    offset = 0
-
-                                severity_idx = max(0, min(len(severity_order)-1, base_idx + offset))
-                                severity = severity_order[severity_idx]
-
-                                # use detected confidence (0..1) -> percentage
-                                confidence_val = round(float(conf) * 100, 1)
-
-                                payload = {
-                                    "location": {
-                                        "latitude": 40.7128,
-                                        "longitude": -74.006,
-                                        "zone": "North Pasture"
-                                    },
-                                    "detectionType": "camera",
-                                    "timestamp": timestamp_iso,
-                                    "severity": severity,
-                                    "animalType": class_name,
-                                    "confidence": confidence_val,
-                                    "resolved": False
-                                }
-
-                                try:
-                                    response = requests.post(
-                                        "https://smart-farm-intrusion-detection-server.onrender.com/api/log/create/6909cdfab50cff3e260f9fef",
-                                        headers={"Content-Type": "application/json"},
-                                        json=payload,
-                                        timeout=2
-                                    )
-                                except Exception as e:
-                                    print(f"Error sending log: {e}")
-                                    response = None
-
-                                print(f"Chosen severity: {severity} (base: {base}, offset: {offset})")
-                                print(f"Log sent. Server response: {getattr(response, 'status_code', 'N/A')}")
-                                print(f"Log sent. Server response: {response.status_code}")
-                                animal_detected = True
-
-                    # Activate buzzer only if animal detected & distance < 50 cm
-                    if animal_detected and self.current_distance < self.distance_threshold:
-                        print(f"⚠️  Animal nearby ({self.current_distance:.2f} cm) - Activating buzzer!")
-                        self.control_buzzer(True)
-                        self.last_buzzer_time = current_time
-
-                    last_detection_time = current_time
-                    time.sleep(0.01)
+                distance = self.current_distance
+                if distance >= self.distance_threshold:
+                    # Nothing within range: skip decoding, resizing and inference
+                    # entirely and wait for the next distance reading
+                    detection_interval = self.detection_interval
+                    next_wake = None
+                else:
+                    # Adaptive cadence; something moving in range cuts the back-off short
+                    if abs(distance - last_detection_distance) >= self.distance_change_reset:
+                        detection_interval = self.detection_interval
+                    if current_time - last_detection_time >= detection_interval:
+                        frame = grabber.get_latest(timeout=1.0)
+                        if frame is not None:
+                            if self.process_frame(frame, current_time):
+                                detection_interval = self.detection_interval
+                            else:
+                                detection_interval = min(2 * detection_interval,
+                                                         self.max_detection_interval)
+                            last_detection_time = current_time
+                            last_detection_distance = distance
+                    next_wake = last_detection_time + detection_interval
+
+                # Sleep until the next detection or buzzer deadline instead of polling;
+                # a new distance reading wakes the loop early so the cadence can change
+                if self._buzzer_off_deadline:
+                    next_wake = (self._buzzer_off_deadline if next_wake is None
+                                 else min(next_wake, self._buzzer_off_deadline))
+                timeout = None if next_wake is None else max(0.0, next_wake - time.monotonic())
+                self._distance_updated.wait(timeout)
+                self._distance_updated.clear()
 
         except KeyboardInterrupt:
             print("\n[INFO] Stopping detection...")
-            self.control_buzzer(False)
+            self.switch_buzzer_off()
         finally:
-            self.cap.release()
+            grabber.stop()
+            grabber_thread.join(timeout=2)
+            self.run_on_network_loop(self.stop_network())
 
 # ---------------------- MAIN ENTRY POINT ----------------------
 if __name__ == "__main__":
+    # Networking (distance listener, buzzer and log requests) starts with the detector
     detector = SmartAnimalDetector()
 
-    # Run distance listener in background thread
-    threading.Thread(target=detector.distance_listener, daemon=True).start()
-
     # Start detection loop
     
     detector.start_detection()
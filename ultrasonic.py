@@ -1,53 +1,126 @@
-import RPi.GPIO as GPIO
 import time
 import socket
+import struct
+import threading
 
 # GPIO setup
 TRIG = 22
 ECHO = 27
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(TRIG, GPIO.OUT)
-GPIO.setup(ECHO, GPIO.IN)
+# Prefer the pigpio daemon: it timestamps echo edges in hardware-timed sampling,
+# so readings don't depend on Python scheduling. Fall back to RPi.GPIO.
+try:
+    import pigpio
+    pi = pigpio.pi()
+    PIGPIO_AVAILABLE = pi.connected
+except ImportError:
+    PIGPIO_AVAILABLE = False
+
+if PIGPIO_AVAILABLE:
+    print("[INFO] Using pigpio for echo timing")
+    pi.set_mode(TRIG, pigpio.OUTPUT)
+    pi.set_mode(ECHO, pigpio.INPUT)
+
+    echo_ticks = {}
+    echo_done = threading.Event()
+
+    def on_edge(gpio, level, tick):
+        """Record rising/falling echo edge ticks (microseconds) from pigpio"""
+        if level == 1:
+            echo_ticks['rise'] = tick
+        elif level == 0 and 'rise' in echo_ticks:
+            echo_ticks['fall'] = tick
+            echo_done.set()
+
+    echo_callback = pi.callback(ECHO, pigpio.EITHER_EDGE, on_edge)
+else:
+    import RPi.GPIO as GPIO
+    print("[INFO] pigpio daemon not available, using RPi.GPIO")
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(TRIG, GPIO.OUT)
+    GPIO.setup(ECHO, GPIO.IN)
+
+    echo_edges = []
+    echo_done = threading.Event()
+
+    def on_echo_edge(channel):
+        """Record echo edge times (ns) from RPi.GPIO's edge thread"""
+        # The pin level may already have changed by the time this runs, so go by
+        # order instead: after a trigger the first edge is the rise, the second the fall
+        echo_edges.append(time.monotonic_ns())
+        if len(echo_edges) == 2:
+            echo_done.set()
+
+    # Armed once: re-arming edge detection per reading takes longer than the
+    # ~0.5 ms between the trigger and the echo going high
+    GPIO.add_event_detect(ECHO, GPIO.BOTH, callback=on_echo_edge)
 
 # Server details (your PC's IP and a port, e.g., 5000)
 SERVER_IP = "10.239.91.200"   # ← replace with your PC’s IP address
 SERVER_PORT = 5000
 
+# Wire format, matching tl3.py: DISTANCE_MAGIC once per connection, then one
+# little-endian float32 (cm) per reading
+DISTANCE_MAGIC = b'SFD\x01'
+DISTANCE_FRAME = struct.Struct('<f')
+
 # Create a socket connection
 sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # send each reading immediately
 
 print(f"[INFO] Connecting to PC at {SERVER_IP}:{SERVER_PORT} ...")
 sock.connect((SERVER_IP, SERVER_PORT))
+sock.sendall(DISTANCE_MAGIC)
 print("[INFO] Connected!")
 
-def get_distance():
-    # Trigger the ultrasonic pulse
+def get_distance_pigpio():
+    # Trigger the ultrasonic pulse; the callback timestamps both echo edges
+    echo_ticks.clear()
+    echo_done.clear()
+    pi.gpio_trigger(TRIG, 10, 1)
+
+    if not echo_done.wait(0.06):
+        return None
+
+    pulse_duration = pigpio.tickDiff(echo_ticks['rise'], echo_ticks['fall']) * 1e-6
+    distance = pulse_duration * 17150  # in cm
+    return round(distance, 2)
+
+def get_distance_rpi_gpio():
+    # Trigger the ultrasonic pulse; the edge callback timestamps both echo edges
+    echo_edges.clear()
+    echo_done.clear()
     GPIO.output(TRIG, True)
     time.sleep(0.00001)
     GPIO.output(TRIG, False)
 
-    # Measure echo time
-    while GPIO.input(ECHO) == 0:
-        pulse_start = time.time()
+    if not echo_done.wait(0.06):
+        return None
 
-    while GPIO.input(ECHO) == 1:
-        pulse_end = time.time()
-
-    pulse_duration = pulse_end - pulse_start
+    pulse_duration = (echo_edges[1] - echo_edges[0]) * 1e-9
     distance = pulse_duration * 17150  # in cm
     # print(f"Distance: {round(distance, 2)} cm")
     return round(distance, 2)
 
+get_distance = get_distance_pigpio if PIGPIO_AVAILABLE else get_distance_rpi_gpio
+
 try:
     while True:
         dist = get_distance()
-        message = f"{dist}\n"
-        sock.sendall(message.encode())
+        if dist is None:
+            print("No echo received, retrying")
+            time.sleep(1)
+            continue
+        sock.sendall(DISTANCE_FRAME.pack(dist))
         print(f"Sent Distance: {dist} cm")
         time.sleep(1)
 
 except KeyboardInterrupt:
     print("\n[INFO] Exiting...")
     sock.close()
-    GPIO.cleanup()
+    if PIGPIO_AVAILABLE:
+        echo_callback.cancel()
+        pi.stop()
+    else:
+        GPIO.remove_event_detect(ECHO)
+        GPIO.cleanup()